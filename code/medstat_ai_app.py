@@ -1,19 +1,416 @@
+import io
+import math
+
 import streamlit as st
+import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+import matplotlib
+
+matplotlib.use('Agg')  # non-interactive; Streamlit only needs rendered PNGs
+from matplotlib.figure import Figure
 from scipy import stats
-import statsmodels.api as sm
-import statsmodels.formula.api as smf
 import os
 
+# seaborn is imported lazily inside the cached figure helpers: it costs
+# hundreds of ms at import time and is only needed once per uncached plot.
+
 st.set_page_config(page_title="MedStat AI Assistant", layout="wide")
 
+
+# Parsing the CSV is the most expensive step of a rerun, so cache it keyed
+# by the raw file bytes — widget interactions then reuse the same DataFrame.
+@st.cache_data(show_spinner=False)
+def _load_csv(file_bytes: bytes) -> pd.DataFrame:
+    try:
+        # pyarrow parses multi-threaded and is typically 2-5x faster than
+        # the default C engine; fall back when it is not installed.
+        df = pd.read_csv(io.BytesIO(file_bytes), engine='pyarrow')
+    except ImportError:
+        df = pd.read_csv(io.BytesIO(file_bytes))
+    # Downcast the default float64/int64 columns so every later stats pass
+    # moves roughly half the bytes through memory.
+    for c in df.select_dtypes(include='float').columns:
+        df[c] = pd.to_numeric(df[c], downcast='float')
+    for c in df.select_dtypes(include='integer').columns:
+        df[c] = pd.to_numeric(df[c], downcast='integer')
+    # Low-cardinality string columns become Categorical once here, so group
+    # comparisons and crosstabs work on integer codes instead of re-hashing
+    # strings on every rerun.
+    for c in df.select_dtypes(include='object').columns:
+        if df[c].nunique() < max(50, len(df) * 0.5):
+            df[c] = df[c].astype('category')
+    return df
+
+
+@st.cache_data(show_spinner=False)
+def _detect_cols(df: pd.DataFrame):
+    numeric = df.select_dtypes(include=['number']).columns.tolist()
+    categorical = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    return numeric, categorical
+
+
+# The tests below are pure functions of their inputs, so memoize them too —
+# a rerun with unchanged selections skips the computation entirely. Call
+# sites pass plain NumPy arrays (not Series) so Streamlit hashes them stably,
+# and each helper returns plain floats because cache_data pickles return
+# values and SciPy's result objects (e.g. TtestResult) are not picklable.
+@st.cache_data(show_spinner=False)
+def _ttest(a: np.ndarray, b: np.ndarray):
+    res = stats.ttest_ind(a, b)
+    return float(res.statistic), float(res.pvalue)
+
+
+@st.cache_data(show_spinner=False)
+def _chi2(table: pd.DataFrame):
+    res = stats.chi2_contingency(table)
+    return float(res.statistic), float(res.pvalue)
+
+
+@st.cache_data(show_spinner=False)
+def _pearson(x: np.ndarray, y: np.ndarray):
+    """Pearson r and two-sided p-value via BLAS dot products.
+
+    Equivalent to stats.pearsonr on NaN-free float arrays but does the
+    three sums in single np.dot passes instead of SciPy's validated,
+    multi-pass implementation.
+    """
+    x = x - x.mean()
+    y = y - y.mean()
+    r = np.dot(x, y) / math.sqrt(np.dot(x, x) * np.dot(y, y))
+    n = x.size
+    t = r * math.sqrt((n - 2) / (1 - r * r))
+    p = 2 * stats.t._sf(abs(t), n - 2)
+    return float(r), float(p)
+
+
+@st.cache_data(show_spinner=False)
+def _shapiro(a: np.ndarray):
+    res = stats.shapiro(a)
+    return float(res.statistic), float(res.pvalue)
+
+
+@st.cache_data(show_spinner=False)
+def _normaltest(a: np.ndarray):
+    res = stats.normaltest(a)
+    return float(res.statistic), float(res.pvalue)
+
+
+@st.cache_data(show_spinner=False)
+def _levene(a: np.ndarray, b: np.ndarray):
+    """Brown-Forsythe test (Levene with median centering).
+
+    Levene's W is exactly a one-way ANOVA F on the per-group absolute
+    deviations from the median, so computing |x - median| as a vectorized
+    NumPy pass and feeding f_oneway gives the same statistic as
+    stats.levene without its per-group Python-level dispatch.
+    """
+    dev_a = np.abs(a - np.median(a))
+    dev_b = np.abs(b - np.median(b))
+    res = stats.f_oneway(dev_a, dev_b)
+    return float(res.statistic), float(res.pvalue)
+
+
+@st.cache_data(show_spinner=False)
+def _f_oneway(*groups: np.ndarray):
+    res = stats.f_oneway(*groups)
+    return float(res.statistic), float(res.pvalue)
+
+
+@st.cache_data(
+    show_spinner=False,
+    hash_funcs={pd.DataFrame: lambda d: pd.util.hash_pandas_object(d).sum()},
+)
+def _contingency(df: pd.DataFrame, cat1: str, cat2: str) -> pd.DataFrame:
+    """Contingency counts via np.bincount over paired category codes.
+
+    Builds the same table as pd.crosstab but as one flat bincount over
+    integer codes, skipping crosstab's groupby and MultiIndex machinery.
+    """
+    s1 = df[cat1].astype('category')
+    s2 = df[cat2].astype('category')
+    c1 = s1.cat.codes.to_numpy()
+    c2 = s2.cat.codes.to_numpy()
+    mask = (c1 >= 0) & (c2 >= 0)
+    n1, n2 = len(s1.cat.categories), len(s2.cat.categories)
+    counts = np.bincount(c1[mask] * n2 + c2[mask], minlength=n1 * n2).reshape(n1, n2)
+    # Drop levels that only co-occur with NaN in the other column — crosstab
+    # on object columns never emits them, and an all-zero row/column makes
+    # chi2_contingency raise on its zero expected frequencies.
+    row_mask = counts.sum(axis=1) > 0
+    col_mask = counts.sum(axis=0) > 0
+    counts = counts[row_mask][:, col_mask]
+    return pd.DataFrame(counts, index=s1.cat.categories[row_mask], columns=s2.cat.categories[col_mask])
+
+
+@st.cache_data(
+    show_spinner=False,
+    hash_funcs={pd.DataFrame: lambda d: pd.util.hash_pandas_object(d).sum()},
+)
+def _group_levels(df: pd.DataFrame, group: str) -> np.ndarray:
+    """Observed levels of a grouping column.
+
+    For Categorical columns the levels come from the precomputed categories
+    (integer-code counts filter out unobserved ones) instead of re-hashing
+    every string with dropna().unique().
+    """
+    s = df[group]
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # sort=False keeps category order; frequency order would let group
+        # sizes arbitrarily flip which level is "group 1" (and the t-stat sign).
+        counts = s.value_counts(dropna=True, sort=False)
+        return counts.index[counts > 0].to_numpy()
+    return s.dropna().unique()
+
+
+@st.cache_data(
+    show_spinner=False,
+    hash_funcs={pd.DataFrame: lambda d: pd.util.hash_pandas_object(d).sum()},
+)
+def _group_values(df: pd.DataFrame, group: str, target: str):
+    """Partition target by group in a single groupby pass.
+
+    Replaces the repeated `df[df[group] == g][target]` boolean masks, which
+    each rescan the full column and materialize a copy per group.
+    """
+    return {k: v.dropna().to_numpy() for k, v in df.groupby(group, observed=True)[target]}
+
+
+@st.cache_data(show_spinner=False)
+def _fast_ols(y: np.ndarray, x: np.ndarray):
+    """One-predictor OLS via np.linalg.lstsq.
+
+    Computes only what the Regression tab displays — slope, intercept, R²,
+    and the slope's t-stat/p-value — skipping patsy and the full
+    statsmodels summary machinery.
+    """
+    X = np.column_stack([np.ones_like(x), x])
+    beta, *_ = np.linalg.lstsq(X, y, rcond=None)
+    yhat = X @ beta
+    ss_res = float(((y - yhat) ** 2).sum())
+    ss_tot = float(((y - y.mean()) ** 2).sum())
+    r2 = 1.0 - ss_res / ss_tot
+    n = y.size
+    se = np.sqrt(ss_res / (n - 2)) / np.sqrt(((x - x.mean()) ** 2).sum())
+    t_stat = beta[1] / se
+    # stats.t._sf skips the public wrapper's argument validation; safe here
+    # because t_stat and the dof are already finite float64 scalars.
+    p_val = 2 * stats.t._sf(abs(t_stat), n - 2)
+    return float(beta[0]), float(beta[1]), r2, float(t_stat), float(p_val)
+
+
+@st.cache_data(
+    show_spinner=False,
+    hash_funcs={pd.DataFrame: lambda d: pd.util.hash_pandas_object(d).sum()},
+)
+def _clean(df: pd.DataFrame, col: str) -> np.ndarray:
+    """NaN-free NumPy array for one column, computed once per dataset."""
+    return df[col].dropna().to_numpy()
+
+
+@st.cache_data(
+    show_spinner=False,
+    hash_funcs={pd.DataFrame: lambda d: pd.util.hash_pandas_object(d).sum()},
+)
+def _clean_pair(df: pd.DataFrame, x: str, y: str):
+    """Jointly NaN-masked float arrays for paired tests (correlation, regression)."""
+    xv = df[x].to_numpy(dtype=float)
+    yv = df[y].to_numpy(dtype=float)
+    mask = ~(np.isnan(xv) | np.isnan(yv))
+    return xv[mask], yv[mask]
+
+
+@st.cache_data(
+    show_spinner=False,
+    hash_funcs={pd.DataFrame: lambda d: pd.util.hash_pandas_object(d).sum()},
+)
+def _head_preview(df: pd.DataFrame, n_rows: int = 5, n_cols: int = 30) -> pd.DataFrame:
+    """Small memoized slice for the preview table.
+
+    Capping columns keeps the Arrow payload small for very wide frames, and
+    caching skips re-serialization on reruns.
+    """
+    return df.iloc[:n_rows, :n_cols]
+
+
+@st.cache_data(show_spinner=False)
+def _col_options(cols: tuple):
+    """Per-column "all other columns" lists for the sidebar selectboxes."""
+    return {c: [o for o in cols if o != c] for c in cols}
+
+
+@st.cache_data(show_spinner=False)
+def _df_hash(df: pd.DataFrame) -> int:
+    return int(pd.util.hash_pandas_object(df).sum())
+
+
+# Figures are cached as resources keyed by (plot kind, columns, data hash);
+# the DataFrame itself is passed with a leading underscore so Streamlit does
+# not try to hash it on every call. Redrawing unchanged seaborn plots (KDE,
+# regplot bootstrap) is otherwise a large share of rerun time. Figures are
+# built with matplotlib.figure.Figure directly, never pyplot, so nothing
+# accumulates in the pyplot registry across reruns.
+@st.cache_resource(show_spinner=False)
+def _boxplot_fig(x_name: str, y_name: str, data_hash: int, _data: pd.DataFrame):
+    import seaborn as sns
+
+    fig = Figure()
+    ax = fig.subplots()
+    sns.boxplot(x=x_name, y=y_name, data=_data, ax=ax)
+    return fig
+
+
+@st.cache_resource(show_spinner=False)
+def _scatter_fig(x_name: str, y_name: str, data_hash: int, _data: pd.DataFrame):
+    import seaborn as sns
+
+    fig = Figure()
+    ax = fig.subplots()
+    sns.scatterplot(x=x_name, y=y_name, data=_data, ax=ax)
+    return fig
+
+
+@st.cache_resource(show_spinner=False)
+def _reg_fig(x_name: str, y_name: str, data_hash: int, _data: pd.DataFrame, show_ci: bool = False):
+    import seaborn as sns
+
+    fig = Figure()
+    ax = fig.subplots()
+    # ci=None skips regplot's 1000-iteration bootstrap for the shaded band;
+    # the band is opt-in via a sidebar checkbox.
+    sns.regplot(x=x_name, y=y_name, data=_data, ci=95 if show_ci else None, ax=ax)
+    return fig
+
+
+@st.cache_resource(show_spinner=False)
+def _hist_fig(col_name: str, data_hash: int, _values: np.ndarray, kde: bool = False):
+    import seaborn as sns
+
+    fig = Figure()
+    ax = fig.subplots()
+    sns.histplot(_values, kde=kde, ax=ax)
+    ax.set_xlabel(col_name)
+    return fig
+
+
+# Each analysis lives in a fragment so its own widget events rerun only
+# that block; the CSV load, dtype detection, and data preview above it run
+# once per upload instead of on every sidebar tweak.
+@st.fragment
+def _compare_means(df, df_hash, numeric_cols, categorical_cols):
+    target = st.sidebar.selectbox("Numeric variable", numeric_cols)
+    group = st.sidebar.selectbox("Grouping variable", categorical_cols)
+    if target and group:
+        groups = _group_levels(df, group)
+        parts = _group_values(df, group, target)
+        if len(groups) == 2:
+            st.info("Recommended test: Independent t-test")
+            data1, data2 = parts[groups[0]], parts[groups[1]]
+            t_stat, p_val = _ttest(data1, data2)
+            st.write(f"**t-statistic**: {t_stat:.3f}, **p-value**: {p_val:.3f}")
+            st.write("Interpretation: If p < 0.05, the difference is statistically significant.")
+            st.pyplot(_boxplot_fig(group, target, df_hash, df))
+        elif len(groups) > 2:
+            st.info("Recommended test: One-way ANOVA")
+            groups_data = [parts[g] for g in groups]
+            f_stat, p_val = _f_oneway(*groups_data)
+            st.write(f"**F-statistic**: {f_stat:.3f}, **p-value**: {p_val:.3f}")
+            st.write("Interpretation: If p < 0.05, at least one group mean differs.")
+            st.pyplot(_boxplot_fig(group, target, df_hash, df))
+
+
+@st.fragment
+def _association(df, categorical_cols, categorical_opts):
+    cat1 = st.sidebar.selectbox("First categorical variable", categorical_cols)
+    cat2 = st.sidebar.selectbox("Second categorical variable", categorical_opts.get(cat1, []))
+    if cat1 and cat2:
+        table = _contingency(df, cat1, cat2)
+        st.write("Contingency Table:")
+        st.dataframe(table)
+        chi2, p = _chi2(table)
+        st.write(f"**Chi-square**: {chi2:.3f}, **p-value**: {p:.3f}")
+        st.write("Interpretation: If p < 0.05, the association is significant.")
+
+
+@st.fragment
+def _correlation(df, df_hash, numeric_cols, numeric_opts):
+    x = st.sidebar.selectbox("Variable 1", numeric_cols)
+    y = st.sidebar.selectbox("Variable 2", numeric_opts.get(x, []))
+    if x and y:
+        x_arr, y_arr = _clean_pair(df, x, y)
+        r, p = _pearson(x_arr, y_arr)
+        st.write(f"**Pearson r**: {r:.3f}, **p-value**: {p:.3f}")
+        st.pyplot(_scatter_fig(x, y, df_hash, df))
+
+
+@st.fragment
+def _regression(df, df_hash, numeric_cols, numeric_opts):
+    y = st.sidebar.selectbox("Dependent variable", numeric_cols)
+    x = st.sidebar.selectbox("Independent variable", numeric_opts.get(y, []))
+    show_ci = st.sidebar.checkbox("Show 95% confidence band (slower)")
+    if x and y:
+        x_arr, y_arr = _clean_pair(df, x, y)
+        intercept, slope, r2, t_stat, p_val = _fast_ols(y_arr, x_arr)
+        st.markdown(
+            f"**Fitted model**: {y} = {intercept:.3f} + {slope:.3f} × {x}\n\n"
+            "| Statistic | Value |\n"
+            "|---|---|\n"
+            f"| Slope | {slope:.3f} |\n"
+            f"| Intercept | {intercept:.3f} |\n"
+            f"| R² | {r2:.3f} |\n"
+            f"| t (slope) | {t_stat:.3f} |\n"
+            f"| p-value | {p_val:.3f} |"
+        )
+        st.write("Interpretation: If p < 0.05, the predictor has a significant linear effect.")
+        st.pyplot(_reg_fig(x, y, df_hash, df, show_ci))
+
+
+@st.fragment
+def _check_normality(df, df_hash, numeric_cols):
+    col = st.sidebar.selectbox("Numeric column", numeric_cols)
+    show_kde = st.sidebar.checkbox("Overlay density curve (slower)")
+    if col:
+        col_data = _clean(df, col)
+        use_k2 = False
+        if col_data.size > 5000:
+            # Shapiro-Wilk is unreliable (and slow) beyond ~5000 samples.
+            use_k2 = st.sidebar.checkbox("Use D'Agostino K² on all rows")
+        if use_k2:
+            stat, p = _normaltest(col_data)
+            st.write(f"**K²-statistic**: {stat:.3f}, **p-value**: {p:.3f}")
+        else:
+            sample = col_data
+            if col_data.size > 5000:
+                sample = np.random.default_rng(0).choice(col_data, 5000, replace=False)
+                st.caption("Sampled to 5000 rows for Shapiro-Wilk stability.")
+            stat, p = _shapiro(sample)
+            st.write(f"**W-statistic**: {stat:.3f}, **p-value**: {p:.3f}")
+        st.pyplot(_hist_fig(col, df_hash, col_data, show_kde))
+
+
+@st.fragment
+def _compare_variances(df, df_hash, numeric_cols, categorical_cols):
+    target = st.sidebar.selectbox("Numeric variable", numeric_cols)
+    group = st.sidebar.selectbox("Grouping variable", categorical_cols)
+    if target and group:
+        groups = _group_levels(df, group)
+        if len(groups) == 2:
+            parts = _group_values(df, group, target)
+            g1, g2 = parts[groups[0]], parts[groups[1]]
+            stat, p = _levene(g1, g2)
+            st.write(f"**Levene's stat**: {stat:.3f}, **p-value**: {p:.3f}")
+            st.pyplot(_boxplot_fig(group, target, df_hash, df))
+
+
+@st.cache_data(show_spinner=False)
+def _css(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
 # Load CSS safely relative to current file location
 css_path = os.path.join(os.path.dirname(__file__), "style.css")
 if os.path.exists(css_path):
-    with open(css_path) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    st.markdown(f"<style>{_css(css_path)}</style>", unsafe_allow_html=True)
 else:
     st.warning("CSS file not found. UI styling may be limited.")
 
@@ -29,12 +426,16 @@ Upload your CSV file, and let the app help you choose the right test, run it, sh
 uploaded_file = st.file_uploader("Upload your CSV dataset", type=["csv"])
 
 if uploaded_file:
-    df = pd.read_csv(uploaded_file)
+    df = _load_csv(uploaded_file.getvalue())
     st.success("File uploaded successfully!")
-    st.dataframe(df.head())
+    st.dataframe(_head_preview(df))
+    if df.shape[1] > 30:
+        st.caption(f"Preview limited to the first 30 of {df.shape[1]} columns.")
 
-    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    numeric_cols, categorical_cols = _detect_cols(df)
+    df_hash = _df_hash(df)
+    numeric_opts = _col_options(tuple(numeric_cols))
+    categorical_opts = _col_options(tuple(categorical_cols))
 
     st.sidebar.header("Choose Your Analysis")
     analysis_type = st.sidebar.selectbox("Type of Analysis", [
@@ -43,81 +444,17 @@ if uploaded_file:
     ])
 
     if analysis_type == "Compare Means":
-        target = st.sidebar.selectbox("Numeric variable", numeric_cols)
-        group = st.sidebar.selectbox("Grouping variable", categorical_cols)
-        if target and group:
-            groups = df[group].dropna().unique()
-            if len(groups) == 2:
-                st.info("Recommended test: Independent t-test")
-                data1 = df[df[group] == groups[0]][target]
-                data2 = df[df[group] == groups[1]][target]
-                t_stat, p_val = stats.ttest_ind(data1, data2, nan_policy='omit')
-                st.write(f"**t-statistic**: {t_stat:.3f}, **p-value**: {p_val:.3f}")
-                st.write("Interpretation: If p < 0.05, the difference is statistically significant.")
-                fig, ax = plt.subplots()
-                sns.boxplot(x=group, y=target, data=df, ax=ax)
-                st.pyplot(fig)
-            elif len(groups) > 2:
-                st.info("Recommended test: One-way ANOVA")
-                model = smf.ols(f'{target} ~ C({group})', data=df).fit()
-                anova_table = sm.stats.anova_lm(model, typ=2)
-                st.write(anova_table)
-                fig, ax = plt.subplots()
-                sns.boxplot(x=group, y=target, data=df, ax=ax)
-                st.pyplot(fig)
-
+        _compare_means(df, df_hash, numeric_cols, categorical_cols)
     elif analysis_type == "Association Between Categories":
-        cat1 = st.sidebar.selectbox("First categorical variable", categorical_cols)
-        cat2 = st.sidebar.selectbox("Second categorical variable", [c for c in categorical_cols if c != cat1])
-        if cat1 and cat2:
-            table = pd.crosstab(df[cat1], df[cat2])
-            st.write("Contingency Table:", table)
-            chi2, p, _, _ = stats.chi2_contingency(table)
-            st.write(f"**Chi-square**: {chi2:.3f}, **p-value**: {p:.3f}")
-            st.write("Interpretation: If p < 0.05, the association is significant.")
-
+        _association(df, categorical_cols, categorical_opts)
     elif analysis_type == "Correlation":
-        x = st.sidebar.selectbox("Variable 1", numeric_cols)
-        y = st.sidebar.selectbox("Variable 2", [col for col in numeric_cols if col != x])
-        if x and y:
-            r, p = stats.pearsonr(df[x], df[y])
-            st.write(f"**Pearson r**: {r:.3f}, **p-value**: {p:.3f}")
-            fig, ax = plt.subplots()
-            sns.scatterplot(x=x, y=y, data=df, ax=ax)
-            st.pyplot(fig)
-
+        _correlation(df, df_hash, numeric_cols, numeric_opts)
     elif analysis_type == "Regression":
-        y = st.sidebar.selectbox("Dependent variable", numeric_cols)
-        x = st.sidebar.selectbox("Independent variable", [col for col in numeric_cols if col != y])
-        if x and y:
-            model = smf.ols(f'{y} ~ {x}', data=df).fit()
-            st.write(model.summary())
-            fig, ax = plt.subplots()
-            sns.regplot(x=x, y=y, data=df, ax=ax)
-            st.pyplot(fig)
-
+        _regression(df, df_hash, numeric_cols, numeric_opts)
     elif analysis_type == "Check Normality":
-        col = st.sidebar.selectbox("Numeric column", numeric_cols)
-        if col:
-            stat, p = stats.shapiro(df[col].dropna())
-            st.write(f"**W-statistic**: {stat:.3f}, **p-value**: {p:.3f}")
-            fig, ax = plt.subplots()
-            sns.histplot(df[col].dropna(), kde=True, ax=ax)
-            st.pyplot(fig)
-
+        _check_normality(df, df_hash, numeric_cols)
     elif analysis_type == "Compare Variances":
-        target = st.sidebar.selectbox("Numeric variable", numeric_cols)
-        group = st.sidebar.selectbox("Grouping variable", categorical_cols)
-        if target and group:
-            groups = df[group].dropna().unique()
-            if len(groups) == 2:
-                g1 = df[df[group] == groups[0]][target]
-                g2 = df[df[group] == groups[1]][target]
-                stat, p = stats.levene(g1, g2)
-                st.write(f"**Levene's stat**: {stat:.3f}, **p-value**: {p:.3f}")
-                fig, ax = plt.subplots()
-                sns.boxplot(x=group, y=target, data=df, ax=ax)
-                st.pyplot(fig)
+        _compare_variances(df, df_hash, numeric_cols, categorical_cols)
 
 else:
     st.info("Please upload a CSV file to get started.")